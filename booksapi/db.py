@@ -1,66 +1,189 @@
+import functools
 import os
-from contextlib import asynccontextmanager
-from typing import AsyncIterator, List, Optional
-from urllib.parse import quote_plus
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
 
+from psycopg.conninfo import make_conninfo
 from psycopg_pool import AsyncConnectionPool
-from psycopg.rows import dict_row
+from psycopg.rows import class_row, tuple_row
 
 # Global async connection pool
 pool: Optional[AsyncConnectionPool] = None
 
+# How a search term is matched against titles / author names
+MatchMode = Literal["prefix", "substring", "exact"]
 
+
+@dataclass(slots=True)
+class BookRow:
+    """A row returned by the search_books PostgreSQL function."""
+
+    book_id: int
+    title: str
+    isbn13: str
+    num_pages: int
+    publication_date: date
+    publisher_name: str
+    authors: str
+
+
+@dataclass(slots=True)
+class MatchedBookRow(BookRow):
+    """A row returned by search_books_many, with the title it matched."""
+
+    matched_name: str
+
+
+@dataclass(slots=True)
+class AuthorBookRow:
+    """A row returned by the search_author PostgreSQL function."""
+
+    author_id: int
+    author_name: str
+    book_id: int
+    title: str
+    isbn13: str
+    num_pages: int
+    publication_date: date
+    publisher_name: str
+
+
+@dataclass(slots=True)
+class AuthorRow:
+    """A row returned by the find_authors PostgreSQL function."""
+
+    author_id: int
+    author_name: str
+    book_count: int
+
+
+@dataclass(slots=True)
+class AuthorBooks:
+    """Matching authors together with their books."""
+
+    authors: List[AuthorRow]
+    books: List[AuthorBookRow]
+
+
+# Row factories built once, instead of a dict (and its key hashing) per row.
+_book_row = class_row(BookRow)
+_matched_book_row = class_row(MatchedBookRow)
+_author_book_row = class_row(AuthorBookRow)
+_author_row = class_row(AuthorRow)
+
+
+@functools.cache
 def _build_dsn_from_env() -> str:
     """
     Build a PostgreSQL DSN from environment variables.
 
+    The result is cached, so the environment is only read once per process.
+
     Uses only:
       - DB_NAME
       - DB_USER
       - DB_PASSWORD
       - DB_HOST (defaults to "localhost" if unset)
       - DB_PORT (defaults to "5432" if unset)
+      - DB_SSLMODE (defaults to "prefer" if unset)
+
+    Connections identify themselves as "books-api" in pg_stat_activity.
     """
     db_name = os.getenv("DB_NAME")
     db_user = os.getenv("DB_USER")
     db_password = os.getenv("DB_PASSWORD")
     db_host = os.getenv("DB_HOST") or "localhost"
     db_port = os.getenv("DB_PORT") or "5432"
+    db_sslmode = os.getenv("DB_SSLMODE") or "prefer"
 
     if not all([db_name, db_user, db_password]):
         raise RuntimeError(
             "Database configuration missing. "
             "Required environment variables: DB_NAME, DB_USER, DB_PASSWORD. "
-            "Optional: DB_HOST (default 'localhost'), DB_PORT (default '5432')."
+            "Optional: DB_HOST (default 'localhost'), DB_PORT (default '5432'), "
+            "DB_SSLMODE (default 'prefer')."
         )
 
-    # URL-encode user and password to safely handle special characters
-    user_enc = quote_plus(db_user)
-    password_enc = quote_plus(db_password)
-
-    # Plain psycopg3 DSN (Data Source Name)
-    dsn = f"postgresql://{user_enc}:{password_enc}@{db_host}:{db_port}/{db_name}"
+    # Keyword/value DSN; make_conninfo quotes special characters for us.
+    dsn = make_conninfo(
+        host=db_host,
+        port=db_port,
+        user=db_user,
+        password=db_password,
+        dbname=db_name,
+        sslmode=db_sslmode,
+        application_name="books-api",
+    )
 
     return dsn
 
 
+def _pool_sizes_from_env() -> Tuple[int, int, int]:
+    """
+    Read the pool sizing from environment variables.
+
+    Uses:
+      - DB_POOL_MIN (defaults to the CPU count, at least 4)
+      - DB_POOL_MAX (defaults to 32)
+      - DB_POOL_MAX_WAITING (defaults to 128; 0 means queue without limit)
+    """
+    min_size = int(os.getenv("DB_POOL_MIN") or max(4, os.cpu_count() or 1))
+    max_size = int(os.getenv("DB_POOL_MAX") or 32)
+    max_waiting = int(os.getenv("DB_POOL_MAX_WAITING") or 128)
+
+    # Never let the warm connections exceed the pool ceiling.
+    return min(min_size, max_size), max_size, max_waiting
+
+
+def _prepare_threshold_from_env() -> Optional[int]:
+    """
+    Read DB_PREPARE_THRESHOLD (defaults to 3).
+
+    Set it to "none" to disable server-side prepared statements, which is
+    needed when connecting through PgBouncer in transaction pooling mode.
+    """
+    value = os.getenv("DB_PREPARE_THRESHOLD") or "3"
+    if value.lower() == "none":
+        return None
+    return int(value)
+
+
 async def init_pool() -> None:
-    """Initialize the global async connection pool."""
+    """
+    Initialize the global async connection pool.
+
+    Waits until all min_size connections are established, so the first
+    requests after startup don't pay the connection setup cost.
+    """
     global pool
     if pool is not None:
         return
 
     dsn = _build_dsn_from_env()
+    min_size, max_size, max_waiting = _pool_sizes_from_env()
     # Create the pool without opening it (constructor-only).
     pool = AsyncConnectionPool(
         conninfo=dsn,
-        min_size=1,
-        max_size=10,
-        kwargs={"row_factory": dict_row},
+        min_size=min_size,
+        max_size=max_size,
+        # Reject requests once this many are queued instead of piling up.
+        max_waiting=max_waiting,
+        # Promote repeated searches to server-side prepared statements
+        # after a few executions so Postgres can reuse the cached plan.
+        # The searches pick their own row class; plain tuples otherwise.
+        kwargs={
+            "row_factory": tuple_row,
+            "prepare_threshold": _prepare_threshold_from_env(),
+        },
         open=False,
     )
-    # Explicitly open the pool to avoid the deprecation warning.
-    await pool.open()
+    # Explicitly open the pool to avoid the deprecation warning, and wait
+    # for the min_size connections to be ready before serving traffic.
+    await pool.open(wait=True, timeout=10)
 
 
 async def close_pool() -> None:
@@ -87,70 +210,318 @@ async def get_connection() -> AsyncIterator:
         yield conn
 
 
-def _make_like_pattern(value: str) -> str:
+# Translation table for escaping LIKE metacharacters, built once.
+_LIKE_ESCAPES = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
+
+
+def _make_like_pattern(value: str, match_mode: MatchMode = "substring") -> str:
     """
-    Build a LIKE pattern for partial matches.
+    Build a LIKE pattern for the requested match mode.
 
     - Strips leading/trailing whitespace.
-    - Wraps the value in %...% so we can match substrings.
+    - Escapes %, _ and \\ so user input can't act as LIKE wildcards
+      (the DB functions use ESCAPE '\\').
+    - "substring" wraps the value in %...%, "prefix" appends a trailing %,
+      and "exact" leaves the value unwrapped.
+
+    Prefix and exact patterns have no leading wildcard, so the DB function
+    can answer them from a B-tree index instead of the trigram index.
     """
-    value = value.strip()
+    value = value.strip().translate(_LIKE_ESCAPES)
     # If the user passes an empty string, keep it as-is; the DB function
     # can decide how to handle that (e.g., return nothing or everything).
     if not value:
         return value
+    if match_mode == "prefix":
+        return f"{value}%"
+    if match_mode == "exact":
+        return value
     return f"%{value}%"
 
 
+# Pre-built SQL per (function, argument count), so every call site maps
+# to the same string and therefore the same server-side prepared statement.
+_SQL = {
+    ("search_books", 1): "SELECT * FROM search_books(%s)",
+    ("search_books", 2): "SELECT * FROM search_books(%s, %s)",
+    ("search_author", 1): "SELECT * FROM search_author(%s)",
+    ("search_author", 2): "SELECT * FROM search_author(%s, %s)",
+    ("find_authors", 1): "SELECT * FROM find_authors(%s)",
+    ("find_authors", 2): "SELECT * FROM find_authors(%s, %s)",
+    ("search_books_many", 2): "SELECT * FROM search_books_many(%s, %s)",
+    ("search_books_many", 3): "SELECT * FROM search_books_many(%s, %s, %s)",
+}
+_COPY_SQL = {
+    key: f"COPY ({sql}) TO STDOUT (FORMAT binary)" for key, sql in _SQL.items()
+}
+
+
+def _query_for(
+    sql: dict,
+    function_name: str,
+    args: tuple,
+    publish_by_date: Optional[date],
+) -> Tuple[str, tuple]:
+    """
+    Pick the overload of a search function for the given arguments.
+
+    publish_by_date is appended to args only when set, so the optional
+    trailing date picks the longer overload.
+    """
+    if publish_by_date is None:
+        return sql[(function_name, len(args))], args
+    return sql[(function_name, len(args) + 1)], (*args, publish_by_date)
+
+
+# In-process LRU cache of search results. The catalog rarely changes, so
+# serving results up to SEARCH_CACHE_TTL seconds old is acceptable.
+# Memory is bounded by the total number of cached rows, not just entries:
+# results larger than SEARCH_CACHE_MAX_ENTRY_ROWS are never cached, and the
+# least recently used entries are evicted beyond SEARCH_CACHE_MAX_ROWS.
+_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE") or 256)
+_CACHE_MAX_ROWS = int(os.getenv("SEARCH_CACHE_MAX_ROWS") or 20000)
+_CACHE_MAX_ENTRY_ROWS = int(os.getenv("SEARCH_CACHE_MAX_ENTRY_ROWS") or 500)
+_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL") or 60)
+_cache: "OrderedDict[tuple, Tuple[float, list]]" = OrderedDict()
+_cache_rows = 0
+
+
+def _cache_get(key: tuple) -> Optional[list]:
+    """Return cached rows for key, or None if missing or expired."""
+    global _cache_rows
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+
+    expires_at, rows = entry
+    if expires_at < time.monotonic():
+        del _cache[key]
+        _cache_rows -= len(rows)
+        return None
+
+    _cache.move_to_end(key)
+    return rows
+
+
+def _cache_put(key: tuple, rows: list) -> None:
+    """
+    Store rows for key, evicting least recently used entries while the
+    cache is over its entry or row budget. Large results are not cached.
+    """
+    global _cache_rows
+    if len(rows) > _CACHE_MAX_ENTRY_ROWS:
+        return
+
+    previous = _cache.pop(key, None)
+    if previous is not None:
+        _cache_rows -= len(previous[1])
+
+    _cache[key] = (time.monotonic() + _CACHE_TTL, rows)
+    _cache_rows += len(rows)
+    while len(_cache) > _CACHE_SIZE or _cache_rows > _CACHE_MAX_ROWS:
+        _, (_, evicted) = _cache.popitem(last=False)
+        _cache_rows -= len(evicted)
+
+
+async def _call(
+    function_name: str,
+    row_factory,
+    pattern: str,
+    publish_by_date: Optional[date],
+) -> list:
+    """Run a search function and fetch all of its rows (cached)."""
+    key = (function_name, pattern, publish_by_date)
+    rows = _cache_get(key)
+    if rows is not None:
+        return rows
+
+    query, params = _query_for(
+        _SQL, function_name, (pattern,), publish_by_date
+    )
+
+    async with get_connection() as conn:
+        # Create the cursor with the search's row class up front, so only
+        # one row maker is built, and close it once the rows are read.
+        async with conn.cursor(row_factory=row_factory) as cur:
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
+
+    _cache_put(key, rows)
+    return rows
+
+
 async def search_author(
     author_name: str,
-    publish_by_date: Optional[str],
-) -> List[dict]:
+    publish_by_date: Optional[date],
+    match_mode: MatchMode = "substring",
+) -> List[AuthorBookRow]:
     """
     Call PostgreSQL function:
-        search_author(author_name text, publish_by_date text default ...)
+        search_author(author_name text, publish_by_date date default ...)
 
-    The author_name is passed as a pattern (e.g. %name%) so that the
-    database function can perform partial / fuzzy matching using LIKE/ILIKE.
+    The author_name is passed as a pattern (e.g. %name% or name%, depending
+    on match_mode) so that the database function can perform partial
+    matching using LIKE/ILIKE.
     """
-    author_pattern = _make_like_pattern(author_name)
+    return await _call(
+        "search_author",
+        _author_book_row,
+        _make_like_pattern(author_name, match_mode),
+        publish_by_date,
+    )
+
+
+async def search_author_with_books(
+    author_name: str,
+    publish_by_date: Optional[date],
+    match_mode: MatchMode = "substring",
+) -> AuthorBooks:
+    """
+    Call PostgreSQL functions:
+        find_authors(author_name text, publish_by_date date default ...)
+        search_author(author_name text, publish_by_date date default ...)
+
+    Both queries are sent together in pipeline mode on one connection, so
+    the second one doesn't cost an extra round-trip.
+    """
+    author_pattern = _make_like_pattern(author_name, match_mode)
+    authors_query, params = _query_for(
+        _SQL, "find_authors", (author_pattern,), publish_by_date
+    )
+    books_query, _ = _query_for(
+        _SQL, "search_author", (author_pattern,), publish_by_date
+    )
 
     async with get_connection() as conn:
-        async with conn.cursor() as cur:
-            if publish_by_date is None:
-                query = "SELECT * FROM search_author(%s);"
-                params = (author_pattern,)
-            else:
-                query = "SELECT * FROM search_author(%s, %s);"
-                params = (author_pattern, publish_by_date)
+        async with (
+            conn.cursor(row_factory=_author_row) as authors_cur,
+            conn.cursor(row_factory=_author_book_row) as books_cur,
+        ):
+            async with conn.pipeline():
+                await authors_cur.execute(authors_query, params)
+                await books_cur.execute(books_query, params)
 
-            await cur.execute(query, params)
-            rows: List[dict] = await cur.fetchall()
-            return rows
+            return AuthorBooks(
+                authors=await authors_cur.fetchall(),
+                books=await books_cur.fetchall(),
+            )
 
 
 async def search_books(
     book_name: str,
-    publish_by_date: Optional[str],
-) -> List[dict]:
+    publish_by_date: Optional[date],
+    match_mode: MatchMode = "substring",
+) -> List[BookRow]:
     """
     Call PostgreSQL function:
-        search_books(book_name text, publish_by_date text default ...)
+        search_books(book_name text, publish_by_date date default ...)
 
-    The book_name is passed as a pattern (e.g. %name%) so that the
-    database function can perform partial / fuzzy matching using LIKE/ILIKE.
+    The book_name is passed as a pattern (e.g. %name% or name%, depending
+    on match_mode) so that the database function can perform partial
+    matching using LIKE/ILIKE.
     """
-    book_pattern = _make_like_pattern(book_name)
+    return await _call(
+        "search_books",
+        _book_row,
+        _make_like_pattern(book_name, match_mode),
+        publish_by_date,
+    )
+
+
+async def search_books_many(
+    book_names: List[str],
+    publish_by_date: Optional[date],
+    match_mode: MatchMode = "substring",
+) -> List[MatchedBookRow]:
+    """
+    Call PostgreSQL function:
+        search_books_many(book_patterns text[], book_names text[],
+                          publish_by_date date default ...)
+
+    All names are sent as one text[] parameter, so several titles are
+    searched in a single round-trip. Names that build the same pattern are
+    only searched once, and each row carries the name (as sent) it matched.
+    """
+    # pattern -> first name that produced it, in request order
+    by_pattern: Dict[str, str] = {}
+    for name in book_names:
+        by_pattern.setdefault(_make_like_pattern(name, match_mode), name)
+    patterns = list(by_pattern)
+    names = list(by_pattern.values())
+
+    key = ("search_books_many", tuple(by_pattern.items()), publish_by_date)
+    rows = _cache_get(key)
+    if rows is not None:
+        return rows
+
+    query, params = _query_for(
+        _SQL, "search_books_many", (patterns, names), publish_by_date
+    )
+
+    async with get_connection() as conn:
+        async with conn.cursor(row_factory=_matched_book_row) as cur:
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
+
+    _cache_put(key, rows)
+    return rows
+
+
+async def stream_books(
+    book_name: str,
+    publish_by_date: Optional[date],
+    match_mode: MatchMode = "substring",
+) -> AsyncIterator[bytes]:
+    """
+    Stream search_books results as Postgres binary COPY data.
+
+    Rows are never turned into Python objects; each block is yielded as it
+    arrives from the server, so large result sets are not buffered in
+    memory. The connection is held until the stream is exhausted.
+    """
+    query, params = _query_for(
+        _COPY_SQL,
+        "search_books",
+        (_make_like_pattern(book_name, match_mode),),
+        publish_by_date,
+    )
 
     async with get_connection() as conn:
         async with conn.cursor() as cur:
-            if publish_by_date is None:
-                query = "SELECT * FROM search_books(%s);"
-                params = (book_pattern,)
-            else:
-                query = "SELECT * FROM search_books(%s, %s);"
-                params = (book_pattern, publish_by_date)
+            async with cur.copy(query, params) as copy:
+                async for block in copy:
+                    yield bytes(block)
 
-            await cur.execute(query, params)
-            rows: List[dict] = await cur.fetchall()
-            return rows
+
+async def batch_search_books(
+    searches: List[Tuple[str, Optional[date]]],
+    match_mode: MatchMode = "substring",
+) -> List[List[BookRow]]:
+    """
+    Run several search_books calls on a single pooled connection.
+
+    The queries are sent in pipeline mode, so all of them reach the server
+    before any result is read back, instead of paying one round-trip each.
+    Results are returned in the same order as the searches.
+    """
+    async with get_connection() as conn, AsyncExitStack() as cursors_stack:
+        cursors = []
+        async with conn.pipeline():
+            for book_name, publish_by_date in searches:
+                query, params = _query_for(
+                    _SQL,
+                    "search_books",
+                    (_make_like_pattern(book_name, match_mode),),
+                    publish_by_date,
+                )
+                # Closed by the exit stack even if the pipeline sync fails.
+                cur = await cursors_stack.enter_async_context(
+                    conn.cursor(row_factory=_book_row)
+                )
+                await cur.execute(query, params)
+                cursors.append(cur)
+
+        results: List[List[BookRow]] = []
+        for cur in cursors:
+            results.append(await cur.fetchall())
+        return results
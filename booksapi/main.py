@@ -1,7 +1,11 @@
-from typing import List, Optional
+from datetime import date
+from typing import AsyncIterator, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
+from psycopg_pool import PoolTimeout, TooManyRequests
+from pydantic import BaseModel
 
 import db  # import as a plain module, since "booksapi" is not a package/module
 
@@ -20,22 +24,49 @@ async def lifespan(app: FastAPI):
 app = FastAPI(title="Books API", lifespan=lifespan)
 
 
+# Upper bound on searches in one /search/batch or /books request, since
+# each one holds a single pooled connection and all results in memory.
+MAX_SEARCHES_PER_REQUEST = 50
+
+
+def _pool_exhausted() -> HTTPException:
+    """
+    503 for requests shed by the connection pool (queue full or timed out),
+    so clients back off and retry instead of treating it as a server fault.
+    """
+    return HTTPException(
+        status_code=503,
+        detail="Database is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+class SearchRequest(BaseModel):
+    name: str
+    publish_by_date: Optional[date] = None
+
+
 @app.get("/author/{author_name}")
 async def get_books_by_author(
     author_name: str,
-    publish_by_date: Optional[str] = None,
-) -> List[dict]:
+    publish_by_date: Optional[date] = None,
+    mode: db.MatchMode = "substring",
+) -> List[db.AuthorBookRow]:
     """
     Get books by author using the PostgreSQL function:
         search_author(author_name, publish_by_date)
 
     The author_name path parameter is treated as a partial match pattern.
+    Pass ?mode=prefix or ?mode=exact to match from the start of the name.
     """
     try:
         return await db.search_author(
             author_name=author_name,
             publish_by_date=publish_by_date,
+            match_mode=mode,
         )
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
     except Exception as exc:  # noqa: BLE001
         # In a real app, log the exception details.
         raise HTTPException(
@@ -44,22 +75,156 @@ async def get_books_by_author(
         ) from exc
 
 
+@app.get("/author/{author_name}/books")
+async def get_author_with_books(
+    author_name: str,
+    publish_by_date: Optional[date] = None,
+    mode: db.MatchMode = "substring",
+) -> db.AuthorBooks:
+    """
+    Get matching authors and their books using the PostgreSQL functions:
+        find_authors(author_name, publish_by_date)
+        search_author(author_name, publish_by_date)
+
+    Both queries are pipelined on one connection.
+    """
+    try:
+        return await db.search_author_with_books(
+            author_name=author_name,
+            publish_by_date=publish_by_date,
+            match_mode=mode,
+        )
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
+    except Exception as exc:  # noqa: BLE001
+        # In a real app, log the exception details.
+        raise HTTPException(
+            status_code=500,
+            detail="Error querying database using find_authors/search_author",
+        ) from exc
+
+
 @app.get("/books/{book_name}")
 async def get_books_by_title(
     book_name: str,
-    publish_by_date: Optional[str] = None,
-) -> List[dict]:
+    publish_by_date: Optional[date] = None,
+    mode: db.MatchMode = "substring",
+) -> List[db.BookRow]:
     """
     Get books by title using the PostgreSQL function:
         search_books(book_name, publish_by_date)
 
     The book_name path parameter is treated as a partial match pattern.
+    Pass ?mode=prefix or ?mode=exact to match from the start of the title.
     """
     try:
         return await db.search_books(
             book_name=book_name,
             publish_by_date=publish_by_date,
+            match_mode=mode,
+        )
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
+    except Exception as exc:  # noqa: BLE001
+        # In a real app, log the exception details.
+        raise HTTPException(
+            status_code=500,
+            detail="Error querying database using search_books",
+        ) from exc
+
+
+@app.get("/books")
+async def get_books_by_titles(
+    names: List[str] = Query(
+        ..., min_length=1, max_length=MAX_SEARCHES_PER_REQUEST
+    ),
+    publish_by_date: Optional[date] = None,
+    mode: db.MatchMode = "substring",
+) -> List[db.MatchedBookRow]:
+    """
+    Get books matching any of several titles using the PostgreSQL function:
+        search_books_many(book_names, publish_by_date)
+
+    Pass each title as a repeated query parameter, e.g.
+    /books?names=hobbit&names=dune. All titles are searched in a single
+    database call, and each row includes the name it matched.
+    """
+    try:
+        return await db.search_books_many(
+            book_names=names,
+            publish_by_date=publish_by_date,
+            match_mode=mode,
+        )
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
+    except Exception as exc:  # noqa: BLE001
+        # In a real app, log the exception details.
+        raise HTTPException(
+            status_code=500,
+            detail="Error querying database using search_books_many",
+        ) from exc
+
+
+@app.get("/books/{book_name}/stream")
+async def stream_books_by_title(
+    book_name: str,
+    publish_by_date: Optional[date] = None,
+    mode: db.MatchMode = "substring",
+) -> StreamingResponse:
+    """
+    Stream books by title as Postgres binary COPY data, using:
+        search_books(book_name, publish_by_date)
+
+    Meant for large result sets; /books/{book_name} is simpler for small ones.
+    """
+    blocks = db.stream_books(
+        book_name=book_name,
+        publish_by_date=publish_by_date,
+        match_mode=mode,
+    )
+    try:
+        # Pull the first block here so query errors still map to a 500.
+        first_block = await anext(blocks, b"")
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
+    except Exception as exc:  # noqa: BLE001
+        # In a real app, log the exception details.
+        raise HTTPException(
+            status_code=500,
+            detail="Error querying database using search_books",
+        ) from exc
+
+    async def body() -> AsyncIterator[bytes]:
+        yield first_block
+        async for block in blocks:
+            yield block
+
+    return StreamingResponse(body(), media_type="application/octet-stream")
+
+
+@app.post("/search/batch")
+async def batch_search_books(
+    searches: List[SearchRequest] = Body(
+        ..., min_length=1, max_length=MAX_SEARCHES_PER_REQUEST
+    ),
+    mode: db.MatchMode = "substring",
+) -> List[List[db.BookRow]]:
+    """
+    Run several title searches in one request using the PostgreSQL function:
+        search_books(book_name, publish_by_date)
+
+    The searches share one database connection and are pipelined, so the
+    whole batch costs roughly one round-trip. Results are returned in the
+    same order as the request body. At most MAX_SEARCHES_PER_REQUEST
+    searches are accepted per batch.
+    """
+    try:
+        return await db.batch_search_books(
+            [(search.name, search.publish_by_date) for search in searches],
+            match_mode=mode,
         )
+    except (TooManyRequests, PoolTimeout) as exc:
+        raise _pool_exhausted() from exc
     except Exception as exc:  # noqa: BLE001
         # In a real app, log the exception details.
         raise HTTPException(
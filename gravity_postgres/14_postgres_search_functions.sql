@@ -0,0 +1,179 @@
+/*
+Search functions used by the Books API.
+
+The API passes in a LIKE pattern. Substring patterns (e.g. %tolkien%) are
+answered by trigram GIN indexes; prefix and exact patterns (e.g. tolk%) have
+no leading wildcard and use the text_pattern_ops B-tree indexes instead.
+Literal %, _ and \ in the search term arrive escaped with a backslash.
+*/
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS book_title_trgm
+    ON book USING gin (title gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS author_name_trgm
+    ON author USING gin (author_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS book_title_prefix
+    ON book (lower(title) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS author_name_prefix
+    ON author (lower(author_name) text_pattern_ops);
+
+/*Earlier versions took publish_by_date as TEXT*/
+DROP FUNCTION IF EXISTS search_books(TEXT, TEXT);
+DROP FUNCTION IF EXISTS search_author(TEXT, TEXT);
+
+/*Books whose title matches the pattern*/
+CREATE OR REPLACE FUNCTION search_books(
+    book_pattern TEXT,
+    publish_by_date DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    book_id INT,
+    title VARCHAR(400),
+    isbn13 VARCHAR(13),
+    num_pages INT,
+    publication_date DATE,
+    publisher_name VARCHAR(400),
+    authors TEXT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT b.book_id,
+           b.title,
+           b.isbn13,
+           b.num_pages,
+           b.publication_date,
+           p.publisher_name,
+           string_agg(a.author_name, ', ' ORDER BY a.author_name)
+    FROM book b
+    JOIN publisher p ON p.publisher_id = b.publisher_id
+    JOIN book_author ba ON ba.book_id = b.book_id
+    JOIN author a ON a.author_id = ba.author_id
+    WHERE b.book_id IN (
+        SELECT m.book_id FROM book m
+        WHERE left(book_pattern, 1) = '%' AND m.title ILIKE book_pattern ESCAPE '\'
+        UNION ALL
+        SELECT m.book_id FROM book m
+        WHERE left(book_pattern, 1) <> '%' AND lower(m.title) LIKE lower(book_pattern) ESCAPE '\'
+    )
+      AND (publish_by_date IS NULL OR b.publication_date <= publish_by_date)
+    GROUP BY b.book_id, p.publisher_name
+    ORDER BY b.publication_date, b.title;
+$$;
+
+/*Books written by an author whose name matches the pattern*/
+CREATE OR REPLACE FUNCTION search_author(
+    author_pattern TEXT,
+    publish_by_date DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    author_id INT,
+    author_name VARCHAR(400),
+    book_id INT,
+    title VARCHAR(400),
+    isbn13 VARCHAR(13),
+    num_pages INT,
+    publication_date DATE,
+    publisher_name VARCHAR(400)
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT a.author_id,
+           a.author_name,
+           b.book_id,
+           b.title,
+           b.isbn13,
+           b.num_pages,
+           b.publication_date,
+           p.publisher_name
+    FROM author a
+    JOIN book_author ba ON ba.author_id = a.author_id
+    JOIN book b ON b.book_id = ba.book_id
+    JOIN publisher p ON p.publisher_id = b.publisher_id
+    WHERE a.author_id IN (
+        SELECT m.author_id FROM author m
+        WHERE left(author_pattern, 1) = '%' AND m.author_name ILIKE author_pattern ESCAPE '\'
+        UNION ALL
+        SELECT m.author_id FROM author m
+        WHERE left(author_pattern, 1) <> '%' AND lower(m.author_name) LIKE lower(author_pattern) ESCAPE '\'
+    )
+      AND (publish_by_date IS NULL OR b.publication_date <= publish_by_date)
+    ORDER BY a.author_name, b.publication_date, b.title;
+$$;
+
+/*Authors whose name matches the pattern, with how many books they published*/
+CREATE OR REPLACE FUNCTION find_authors(
+    author_pattern TEXT,
+    publish_by_date DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    author_id INT,
+    author_name VARCHAR(400),
+    book_count BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT a.author_id,
+           a.author_name,
+           count(b.book_id)
+    FROM author a
+    LEFT JOIN book_author ba ON ba.author_id = a.author_id
+    LEFT JOIN book b ON b.book_id = ba.book_id
+        AND (publish_by_date IS NULL OR b.publication_date <= publish_by_date)
+    WHERE a.author_id IN (
+        SELECT m.author_id FROM author m
+        WHERE left(author_pattern, 1) = '%' AND m.author_name ILIKE author_pattern ESCAPE '\'
+        UNION ALL
+        SELECT m.author_id FROM author m
+        WHERE left(author_pattern, 1) <> '%' AND lower(m.author_name) LIKE lower(author_pattern) ESCAPE '\'
+    )
+    GROUP BY a.author_id
+    ORDER BY a.author_name;
+$$;
+
+/*Books whose title matches any of the patterns, tagged with the name that matched.
+book_names[i] is the name the caller sent for book_patterns[i]*/
+CREATE OR REPLACE FUNCTION search_books_many(
+    book_patterns TEXT[],
+    book_names TEXT[],
+    publish_by_date DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    book_id INT,
+    title VARCHAR(400),
+    isbn13 VARCHAR(13),
+    num_pages INT,
+    publication_date DATE,
+    publisher_name VARCHAR(400),
+    authors TEXT,
+    matched_name TEXT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT b.book_id,
+           b.title,
+           b.isbn13,
+           b.num_pages,
+           b.publication_date,
+           p.publisher_name,
+           string_agg(a.author_name, ', ' ORDER BY a.author_name),
+           pat.name
+    FROM unnest(book_patterns, book_names) WITH ORDINALITY AS pat(pattern, name, position)
+    JOIN LATERAL (
+        SELECT m.book_id FROM book m
+        WHERE left(pat.pattern, 1) = '%' AND m.title ILIKE pat.pattern ESCAPE '\'
+        UNION ALL
+        SELECT m.book_id FROM book m
+        WHERE left(pat.pattern, 1) <> '%' AND lower(m.title) LIKE lower(pat.pattern) ESCAPE '\'
+    ) hit ON true
+    JOIN book b ON b.book_id = hit.book_id
+    JOIN publisher p ON p.publisher_id = b.publisher_id
+    JOIN book_author ba ON ba.book_id = b.book_id
+    JOIN author a ON a.author_id = ba.author_id
+    WHERE publish_by_date IS NULL OR b.publication_date <= publish_by_date
+    GROUP BY pat.position, pat.name, b.book_id, p.publisher_name
+    ORDER BY pat.position, b.publication_date, b.title;
+$$;